@@ -1,18 +1,22 @@
-from fastapi import FastAPI, Request, Response, HTTPException, Depends, Cookie
+from fastapi import Request, Response, HTTPException, Depends, Cookie
 from fastapi.responses import RedirectResponse, JSONResponse
-from supabase import create_client, Client
+from functools import lru_cache
+from typing import TYPE_CHECKING
+from cache import cache, AUTH_TTL
+import hashlib
+import time
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import jwt
 
+if TYPE_CHECKING:
+    from supabase import Client
+    from gotrue.types import User
+
 # Load environment variables
 load_dotenv()
 
-# Initialize FastAPI app
-app = FastAPI()
-
-# Initialize Supabase client
 supabase_url = os.getenv('SUPABASE_URL')
 supabase_key = os.getenv('SUPABASE_KEY')
 JWT_SECRET = os.getenv('JWT_SECRET', 'your-secret-key')  # Add this to your .env file
@@ -20,7 +24,11 @@ JWT_SECRET = os.getenv('JWT_SECRET', 'your-secret-key')  # Add this to your .env
 if not supabase_url or not supabase_key:
     raise ValueError("Supabase credentials not found in environment variables")
 
-supabase: Client = create_client(supabase_url, supabase_key)
+@lru_cache(maxsize=None)
+def get_supabase() -> "Client":
+    """Create the Supabase client on first use; the SDK is slow to import."""
+    from supabase import create_client
+    return create_client(supabase_url, supabase_key)
 
 def create_subscription_token(user_id: str, has_active_subscription: bool) -> str:
     """Create a JWT token containing user ID and subscription status"""
@@ -41,6 +49,25 @@ def verify_subscription_token(token: str) -> dict:
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+def get_verified_user(token: str) -> "User":
+    """Verify a Supabase access token, caching the user for a few minutes.
+
+    Entries never outlive the token's own expiry.
+    """
+    cache_key = f"auth:user:{hashlib.sha256(token.encode()).hexdigest()}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        from gotrue.types import User
+        return User.model_validate(cached)
+
+    user = get_supabase().auth.get_user(token).user
+    # Signature was just checked by Supabase; only read exp here
+    expires_at = jwt.decode(token, options={"verify_signature": False}).get('exp', 0)
+    ttl = min(AUTH_TTL, expires_at - time.time())
+    if user and ttl > 0:
+        cache.set(cache_key, user.model_dump(mode="json"), ttl=ttl)
+    return user
+
 def get_current_user(request: Request):
     """Extracts and verifies the JWT from cookies using Supabase"""
     token = request.cookies.get("session")
@@ -49,8 +76,10 @@ def get_current_user(request: Request):
     
     try:
         # Use Supabase to verify the token and get user
-        user = supabase.auth.get_user(token)
-        return user.user
+        user = get_verified_user(token)
+        if not user:
+            raise ValueError("No user data returned")
+        return user
     except Exception as e:
         raise HTTPException(status_code=401, detail="Invalid authentication")
 
@@ -90,11 +119,10 @@ def init_auth_routes(app):
     app.post("/verify-user")(verify_user)
     return app
 
-@app.post("/auth/google/signin")
 async def google_signin():
     """Starts Google OAuth login and redirects to Google's auth page"""
     try:
-        auth_response = supabase.auth.sign_in_with_oauth({
+        auth_response = get_supabase().auth.sign_in_with_oauth({
             "provider": "google",
             "options": {
                 "redirect_to": "http://localhost:8000/auth/callback"
@@ -106,12 +134,11 @@ async def google_signin():
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/auth/callback")
 async def auth_callback(code: str):
     """Handles the OAuth callback and sets a session cookie"""
     try:
         # Correct way to exchange code for session
-        session = supabase.auth.exchange_code_for_session({"auth_code": code})
+        session = get_supabase().auth.exchange_code_for_session({"auth_code": code})
 
         # Extract access token
         access_token = session.session.access_token
@@ -130,7 +157,7 @@ async def auth_callback(code: str):
         )
         
         # After setting session cookie, verify subscription status
-        user = supabase.auth.get_user(access_token).user
+        user = get_supabase().auth.get_user(access_token).user
         subscription_response = await verify_user_subscription(user.id)
         if isinstance(subscription_response, Response):
             # Copy subscription cookie to this response
@@ -142,7 +169,6 @@ async def auth_callback(code: str):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/auth/user")
 async def get_user(request: Request):
     """Returns authenticated user's details"""
     try:
@@ -159,7 +185,6 @@ async def get_user(request: Request):
     except HTTPException:
         return RedirectResponse(url="/login", status_code=303)
 
-@app.post("/auth/logout")
 async def logout(response: Response):
     """Clears authentication cookie"""
     response = RedirectResponse(url="/login")
@@ -171,7 +196,7 @@ async def verify_user_subscription(user_id: str) -> Response:
     """Check user's subscription status and update subscription cookie"""
     try:
         # Query Supabase for active subscription
-        subscription = supabase.table('subscriptions').select('*').eq('user_id', user_id).eq('status', 'active').execute()
+        subscription = get_supabase().table('subscriptions').select('*').eq('user_id', user_id).eq('status', 'active').execute()
         has_active_subscription = len(subscription.data) > 0
         
         # Create subscription token
@@ -195,7 +220,6 @@ async def verify_user_subscription(user_id: str) -> Response:
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/verify-user")
 async def verify_user(user=Depends(get_current_user)):
     """Verify user's authentication and subscription status"""
     return await verify_user_subscription(user.id)
@@ -0,0 +1,247 @@
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "sqlite" shares state across uvicorn workers and restarts; "memory" is per process
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'sqlite')
+CACHE_PATH = os.getenv('CACHE_PATH', 'vidimatch_cache.sqlite3')
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '10000'))
+
+# Default TTLs (seconds)
+ANALYSIS_TTL = 24 * 3600
+YOUTUBE_TTL = 3600
+AUTH_TTL = 300
+
+
+class CacheBackend(ABC):
+    """Key/value store with per-key TTL. Values must be JSON serializable.
+
+    ttl=None means the entry never expires; ttl=0 means it is already expired.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Atomically add to a counter and return the new value.
+
+        ttl only applies when the counter is created, which gives fixed-window
+        counters for things like rate limits.
+        """
+
+    def _count(self, value):
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class MemoryCache(CacheBackend):
+    """In-process cache; state is lost on restart and not shared between workers.
+
+    Holds at most max_entries keys, evicting the least recently used first.
+    """
+
+    # Sweep expired entries roughly every this many writes
+    PURGE_INTERVAL = 500
+
+    def __init__(self, max_entries: int = 10000):
+        super().__init__()
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def _store(self, key, entry):
+        # Callers hold the lock
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        self._writes += 1
+        if self._writes % self.PURGE_INTERVAL == 0:
+            now = time.time()
+            for expired in [k for k, (_, expires_at) in self._data.items()
+                            if expires_at is not None and expires_at <= now]:
+                del self._data[expired]
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+        return self._count(entry[0] if entry else None)
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._store(key, (value, expires_at))
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key, amount=1, ttl=None):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                entry = (0, time.time() + ttl if ttl is not None else None)
+            value = entry[0] + amount
+            self._store(key, (value, entry[1]))
+        return value
+
+
+class SQLiteCache(CacheBackend):
+    """Cache in a local SQLite file in WAL mode, shared by every worker on the host.
+
+    The file is opened on first use. SQLite errors (locked or unwritable database)
+    are logged and degrade to cache misses and dropped writes, never request failures.
+    """
+
+    # Purge expired rows roughly every this many writes
+    PURGE_INTERVAL = 500
+    # Calls run on the event loop, so wait only briefly for a lock held by another worker
+    BUSY_TIMEOUT = 0.2
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self._initialized = False
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.BUSY_TIMEOUT, isolation_level=None)
+            try:
+                conn.execute("PRAGMA synchronous=NORMAL")
+                if not self._initialized:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS cache ("
+                        "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+                    )
+                    self._initialized = True
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        try:
+            row = self._conn().execute(
+                "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Cache read failed for {key}: {str(e)}")
+            row = None
+        return self._count(json.loads(row[0]) if row else None)
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_INTERVAL == 0:
+                conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            print(f"Cache write failed for {key}: {str(e)}")
+
+    def delete(self, key):
+        try:
+            self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            print(f"Cache delete failed for {key}: {str(e)}")
+
+    def incr(self, key, amount=1, ttl=None):
+        try:
+            return self._incr(key, amount, ttl)
+        except sqlite3.Error as e:
+            # Fail open: behave as if the counter had just been created
+            print(f"Cache increment failed for {key}: {str(e)}")
+            return amount
+
+    def _incr(self, key, amount, ttl):
+        conn = self._conn()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock up front so concurrent workers serialize
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, now),
+            ).fetchone()
+            if row:
+                value, expires_at = json.loads(row[0]) + amount, row[1]
+            else:
+                value, expires_at = amount, now + ttl if ttl is not None else None
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+
+def create_cache() -> CacheBackend:
+    """Build the cache backend selected by CACHE_BACKEND"""
+    if CACHE_BACKEND == 'memory':
+        return MemoryCache(CACHE_MAX_ENTRIES)
+    if CACHE_BACKEND == 'sqlite':
+        return SQLiteCache(CACHE_PATH)
+    raise ValueError(f"Unknown CACHE_BACKEND: {CACHE_BACKEND}")
+
+
+cache = create_cache()
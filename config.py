@@ -1,13 +1,10 @@
 from dotenv import load_dotenv
+from functools import lru_cache
 import os
-from openai import OpenAI
 
 # Load environment variables from a .env file
 load_dotenv()
 
-# Print all environment variables for debugging
-print("Environment variables:", os.environ)
-
 # Initialize API keys
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
@@ -17,5 +14,8 @@ if not OPENAI_API_KEY:
 if not YOUTUBE_API_KEY:
     raise ValueError("YOUTUBE_API_KEY not found in environment variables")
 
-# Initialize the OpenAI client
-openai_client = OpenAI(api_key=OPENAI_API_KEY) 
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_openai_client():
+    """Create the OpenAI client on first use (async so slow calls can be hedged and cancelled)"""
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=OPENAI_API_KEY)
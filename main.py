@@ -1,73 +1,144 @@
-from fastapi import FastAPI, Request, Depends, HTTPException
+from fastapi import FastAPI, Request, Response, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import RedirectResponse, JSONResponse
-from jose import JWTError, jwt
-from typing import List
+from contextlib import asynccontextmanager
+from typing import Optional
 from models import VideoAnalysisRequest, VideoAnalysis
 from youtube_client import get_youtube_client, get_video_details, get_video_comments
-from openai_client import analyze_content
-from auth import init_auth_routes, get_current_user, get_subscription_status, verify_user_subscription, check_subscription_status, supabase
-from stripe_config import create_checkout_session
+from openai_client import analyze_content, get_openai_metrics, get_encoding
+from auth import init_auth_routes, get_current_user, get_subscription_status, verify_user_subscription, get_supabase, get_verified_user
+from stripe_config import create_checkout_session, get_stripe
+from config import get_openai_client
 from stripe_webhooks import WEBHOOK_HANDLERS
+from cache import cache, ANALYSIS_TTL
+from responses import json_response, COMPRESSION_MIN_SIZE, GZIP_LEVEL
+from pages import get_pages, page_response, serve_static
 from pydantic import BaseModel
-import stripe
+import asyncio
+import hashlib
 import os
+import time
 
 class CheckoutRequest(BaseModel):
     plan: str
 
-# Create a FastAPI application instance
-app = FastAPI()
+# Descriptions are cut to this length in compact mode
+COMPACT_DESCRIPTION_LENGTH = 200
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Heavy clients are created lazily; the lifespan hook warms them in parallel so
+# the first request doesn't pay for the imports
+WARMUP_TASKS = {
+    "supabase": get_supabase,
+    "openai": get_openai_client,
+    "tiktoken": get_encoding,
+    "youtube": get_youtube_client,
+    "stripe": get_stripe,
+    "pages": get_pages,
+}
 
-# Initialize templates
-templates = Jinja2Templates(directory="static/templates")
+# Per-client startup budget; e.g. tiktoken downloads its BPE file with no timeout
+WARMUP_TIMEOUT = 10.0
 
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    #allow_origins=["chrome-extension://iegaghldafpocoemdkcldpnchgignjgg"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-) 
+async def warm_up():
+    """Initialize heavy clients in worker threads and log how long each took.
 
-@app.post("/analyze/", response_model=List[VideoAnalysis])
-async def analyze_videos(request: VideoAnalysisRequest, subscription=Depends(get_subscription_status)):
-    """Endpoint to analyze multiple videos. Requires active subscription."""
+    Failures and timeouts are logged, not raised; the client is retried lazily on first use.
+    """
+    async def timed(name, init):
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.to_thread(init), timeout=WARMUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            # The thread can't be interrupted; it keeps going in the background
+            print(f"Warm-up of {name} timed out after {WARMUP_TIMEOUT:g}s")
+        except Exception as e:
+            print(f"Warm-up of {name} failed: {str(e)}")
+        return name, time.perf_counter() - start
+
+    start = time.perf_counter()
+    timings = await asyncio.gather(*(timed(name, init) for name, init in WARMUP_TASKS.items()))
+    print("Startup warm-up: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings)
+          + f" (total {time.perf_counter() - start:.2f}s)")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warm_up()
+    yield
+
+def parse_fields(fields: Optional[str]) -> Optional[set]:
+    """Parse a comma-separated VideoAnalysis field list; video_id is always included"""
+    if not fields:
+        return None
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected - VideoAnalysis.model_fields.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return selected | {"video_id"}
+
+async def analyze_videos(
+    request: VideoAnalysisRequest,
+    http_request: Request,
+    fields: Optional[str] = None,
+    compact: bool = False,
+    subscription=Depends(get_subscription_status),
+):
+    """Endpoint to analyze multiple videos. Requires active subscription.
+
+    `fields` limits each result to the listed fields (e.g. `match_rate,comment_summaries`);
+    `compact` truncates descriptions to COMPACT_DESCRIPTION_LENGTH characters.
+    """
+    selected_fields = parse_fields(fields)
     youtube = get_youtube_client()
     results = []
     
+    # Search terms are free text, so hash them to keep cache keys short
+    term_hash = hashlib.sha256(request.search_term.strip().lower().encode()).hexdigest()[:16]
+
     for video_id in request.video_ids:
+        cache_key = f"analysis:{video_id}:{term_hash}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            results.append(VideoAnalysis(**cached))
+            continue
+
         video_details = get_video_details(youtube, video_id)
         comments = get_video_comments(youtube, video_id)
         
-        analysis = analyze_content(
+        analysis = await analyze_content(
             request.search_term,
             video_details['title'],
             video_details['description'],
             comments
         )
         
-        results.append(VideoAnalysis(
+        video_analysis = VideoAnalysis(
             video_id=video_id,
             match_rate=analysis['match_rate'],
             comment_summaries=analysis['comment_summaries'],
             title=video_details['title'],
             description=video_details['description']
-        ))
-    
-    return results
+        )
+        if not analysis.get('fallback') and not analysis.get('repaired'):
+            cache.set(cache_key, video_analysis.model_dump(), ttl=ANALYSIS_TTL)
+        results.append(video_analysis)
+
+    content = []
+    for video_analysis in results:
+        item = video_analysis.model_dump(include=selected_fields)
+        if compact and 'description' in item:
+            item['description'] = item['description'][:COMPACT_DESCRIPTION_LENGTH]
+        content.append(item)
+    return json_response(http_request, content)
 
-# Initialize authentication routes
-init_auth_routes(app)
+async def openai_metrics():
+    """Hedge rate, call latency percentiles and circuit breaker state for OpenAI calls"""
+    return get_openai_metrics()
+
+async def cache_metrics():
+    """Hit rate of the shared cache as seen by this worker"""
+    return cache.stats()
 
-@app.post("/create-checkout-session")
 async def create_stripe_checkout_session(request: CheckoutRequest, user=Depends(get_current_user)):
     """Create a Stripe checkout session for subscription or one-time payment."""
     try:
@@ -78,9 +149,9 @@ async def create_stripe_checkout_session(request: CheckoutRequest, user=Depends(
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to create checkout session")
 
-@app.post("/webhook/stripe")
 async def stripe_webhook(request: Request):
     """Handle Stripe webhook events"""
+    stripe = get_stripe()
     payload = await request.body()
     sig_header = request.headers.get("stripe-signature")
     webhook_secret = os.getenv("STRIPE_WEBHOOK_SECRET")
@@ -111,35 +182,31 @@ async def stripe_webhook(request: Request):
     return JSONResponse(content={"status": "ignored", "type": event.type})
   
 # Page routes
-@app.get("/")
 async def index(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return page_response(request, "index.html")
 
-@app.get("/checkout-success")
 async def checkout_success(request: Request):
     """Handle successful checkout with subscription verification polling"""
-    return templates.TemplateResponse("checkout_success.html", {"request": request})
+    return page_response(request, "checkout_success.html")
 
-@app.get("/login")
 async def login(request: Request):
     try:
         # Check if user is already authenticated
         token = request.cookies.get("session")
         if token:
-            user = supabase.auth.get_user(token)
-            if user and user.user:
+            user = get_verified_user(token)
+            if user:
                 # Valid session exists, redirect to dashboard
                 return RedirectResponse(url="/dashboard", status_code=303)
     except Exception:
         # If token is invalid, delete it and show login page
-        response = templates.TemplateResponse("login.html", {"request": request})
+        response = page_response(request, "login.html", "private, no-cache")
         response.delete_cookie(key="session")
         return response
     
     # No token or invalid token, show login page
-    return templates.TemplateResponse("login.html", {"request": request})
+    return page_response(request, "login.html", "private, no-cache")
 
-@app.get("/dashboard")
 async def dashboard(request: Request):
     try:
         # Check if user is authenticated
@@ -151,27 +218,17 @@ async def dashboard(request: Request):
         # Verify token
         try:
             print("Attempting to verify user token...")
-            user = supabase.auth.get_user(token)
-            if not user or not user.user:
+            user = get_verified_user(token)
+            if not user:
                 print("User verification failed: No user data returned")
                 response = RedirectResponse(url="/login", status_code=303)
                 response.delete_cookie(key="session")
                 return response
                 
-            print(f"User verified successfully: {user.user.email}")
-            # Check subscription status
-            has_subscription = check_subscription_status(request)
-            print(f"Subscription status: {has_subscription}")
-                
-            # User is authenticated, show dashboard
-            return templates.TemplateResponse("dashboard.html", {
-                "request": request,
-                "user": {
-                    "email": user.user.email,
-                    "name": user.user.user_metadata.get('full_name') if user.user.user_metadata else None,
-                    "has_subscription": has_subscription
-                }
-            })
+            print(f"User verified successfully: {user.email}")
+
+            # User is authenticated, show dashboard (user details are loaded client-side from /auth/user)
+            return page_response(request, "dashboard.html", "private, no-cache")
         except Exception as e:
             print(f"Token verification error: {str(e)}")
             # Only delete cookie if it's a token validation error
@@ -187,6 +244,49 @@ async def dashboard(request: Request):
         print(f"Dashboard error: {str(e)}")
         return RedirectResponse(url="/login", status_code=303)
 
+def create_app() -> FastAPI:
+    """Build the FastAPI application"""
+    app = FastAPI(lifespan=lifespan)
+
+    # Static files, fingerprinted and precompressed
+    app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)(serve_static)
+
+    # Add CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        #allow_origins=["chrome-extension://iegaghldafpocoemdkcldpnchgignjgg"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Compress other large responses; /analyze/ compresses its own (with brotli when accepted)
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE, compresslevel=GZIP_LEVEL)
+
+    # The handler serializes its own response, which `fields` may trim to a subset of VideoAnalysis
+    app.post("/analyze/", response_class=Response, responses={
+        200: {"description": "List of VideoAnalysis objects, limited to `fields` when given",
+              "content": {"application/json": {}}},
+    })(analyze_videos)
+    app.get("/metrics/openai")(openai_metrics)
+    app.get("/metrics/cache")(cache_metrics)
+
+    # Initialize authentication routes
+    init_auth_routes(app)
+
+    app.post("/create-checkout-session")(create_stripe_checkout_session)
+    app.post("/webhook/stripe")(stripe_webhook)
+
+    # Page routes
+    app.get("/")(index)
+    app.get("/checkout-success")(checkout_success)
+    app.get("/login")(login)
+    app.get("/dashboard")(dashboard)
+    return app
+
+app = create_app()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
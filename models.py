@@ -1,6 +1,10 @@
-from pydantic import BaseModel
+import math
+from pydantic import BaseModel, field_validator
 from typing import List
 
+# Number of comment summaries the extension displays per video
+COMMENT_SUMMARY_COUNT = 3
+
 class VideoAnalysisRequest(BaseModel):
     video_ids: List[str]
     search_term: str
@@ -10,4 +14,34 @@ class VideoAnalysis(BaseModel):
     match_rate: float
     comment_summaries: List[str]
     title: str
-    description: str 
\ No newline at end of file
+    description: str
+
+class ContentAnalysis(BaseModel):
+    """Structured GPT output for a single video, clamped to the ranges the extension expects"""
+    match_rate: float
+    comment_summaries: List[str]
+
+    @field_validator('match_rate', mode='before')
+    @classmethod
+    def clamp_match_rate(cls, value):
+        """Accept numbers or strings like '85%' and clamp to 0-100; anything else is invalid"""
+        if value is None or isinstance(value, bool):
+            raise ValueError("match_rate is missing")
+        try:
+            value = float(str(value).strip().rstrip('%'))
+        except ValueError:
+            raise ValueError(f"match_rate is not a number: {value!r}")
+        if not math.isfinite(value):
+            raise ValueError(f"match_rate is not a number: {value!r}")
+        return min(max(value, 0.0), 100.0)
+
+    @field_validator('comment_summaries', mode='before')
+    @classmethod
+    def repair_comment_summaries(cls, value):
+        """Coerce to a list of non-empty strings, capped at COMMENT_SUMMARY_COUNT"""
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, (list, tuple)):
+            raise ValueError("comment_summaries must be a list")
+        summaries = [str(item).strip() for item in value if item is not None]
+        return [summary for summary in summaries if summary][:COMMENT_SUMMARY_COUNT]
@@ -1,23 +1,142 @@
+import asyncio
 import json
+import re
+from functools import lru_cache
 from fastapi import HTTPException
-from typing import List
-from config import openai_client as client
-import tiktoken  # Import tiktoken
+from pydantic import ValidationError
+from typing import List, Tuple
+from config import get_openai_client
+from models import ContentAnalysis, COMMENT_SUMMARY_COUNT
+from resilience import LatencyTracker, CircuitBreaker, hedged_call
+
+# Strict JSON schema for the completion, mirrors ContentAnalysis
+ANALYSIS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "video_analysis",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "match_rate": {
+                    "type": "number",
+                    "description": "How well the video matches the search term, 0-100",
+                },
+                "comment_summaries": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": f"{COMMENT_SUMMARY_COUNT} main points from comments, 3-4 words each",
+                },
+            },
+            "required": ["match_rate", "comment_summaries"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# The schema output is ~20 tokens of JSON plus 3 short summaries (~10 tokens each),
+# so this leaves headroom without paying for runaway completions
+ANALYSIS_MAX_TOKENS = 80
+
+# Per-attempt timeout; hedging keeps typical calls well under this
+OPENAI_CALL_TIMEOUT = 15.0
+
+latency_tracker = LatencyTracker()
+circuit_breaker = CircuitBreaker()
+
+MATCH_RATE_PATTERN = re.compile(r'"match_rate"\s*:\s*"?(-?[0-9]+(?:\.[0-9]+)?)')
+
+
+@lru_cache(maxsize=None)
+def provider_errors() -> tuple:
+    """Errors that indicate the provider is degraded rather than a bad request"""
+    import openai
+    return (
+        openai.APIConnectionError,  # includes APITimeoutError
+        openai.RateLimitError,
+        openai.InternalServerError,
+        asyncio.TimeoutError,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    """Load the tokenizer on first use; it is slow to import and may download its BPE file"""
+    import tiktoken
+    return tiktoken.encoding_for_model("gpt-4o-mini")  # Use the appropriate model
 
 
 def count_tokens(text: str) -> int:
     """Count the number of tokens in the given text."""
-    encoding = tiktoken.encoding_for_model("gpt-4o-mini")  # Use the appropriate model
-    return len(encoding.encode(text))
+    return len(get_encoding().encode(text))
+
+
+def parse_analysis(raw_content: str) -> Tuple[ContentAnalysis, bool]:
+    """Validate model output against ContentAnalysis, repairing common formatting issues.
+
+    Falls back to stripping code fences / surrounding text, then to salvaging
+    match_rate from truncated output. Returns (analysis, repaired), where repaired
+    means data was lost and the result shouldn't be cached. Raises ValueError if
+    nothing usable is found.
+    """
+    raw_content = (raw_content or "").strip()
+    try:
+        return ContentAnalysis.model_validate_json(raw_content), False
+    except ValidationError:
+        pass
+
+    # Strip ```json fences or any text around the JSON object
+    start, end = raw_content.find("{"), raw_content.rfind("}")
+    if start != -1 and end > start:
+        try:
+            return ContentAnalysis.model_validate(json.loads(raw_content[start:end + 1])), False
+        except (json.JSONDecodeError, ValidationError):
+            pass
+
+    # Truncated output: keep the score, drop the summaries
+    match = MATCH_RATE_PATTERN.search(raw_content)
+    if match:
+        return ContentAnalysis(match_rate=match.group(1), comment_summaries=[]), True
 
+    raise ValueError("No valid analysis found in model output")
 
-def analyze_content(
+
+def get_openai_metrics() -> dict:
+    """Hedging and circuit breaker state for the metrics endpoint"""
+    return {
+        "hedging": latency_tracker.snapshot(),
+        "circuit_breaker": circuit_breaker.snapshot(),
+    }
+
+
+def local_analysis(search_term: str, title: str, description: str) -> dict:
+    """Keyword-overlap score used when the OpenAI provider is degraded.
+
+    Results are flagged with 'fallback' so callers don't cache them.
+    """
+    terms = set(re.findall(r"\w+", search_term.lower()))
+    if not terms:
+        return {"match_rate": 0.0, "comment_summaries": [], "fallback": True}
+    title_words = set(re.findall(r"\w+", title.lower()))
+    description_words = set(re.findall(r"\w+", (description or "").lower()))
+    # Title matches count fully, description-only matches count half
+    score = sum(1.0 if term in title_words else 0.5 if term in description_words else 0.0
+                for term in terms)
+    analysis = ContentAnalysis(match_rate=100 * score / len(terms), comment_summaries=[])
+    return {**analysis.model_dump(), "fallback": True}
+
+
+async def analyze_content(
     search_term: str,
     title: str,
     description: str,
     comments: List[str],
 ) -> dict:
-    """Analyze video content using GPT-4o-mini."""
+    """Analyze video content using GPT-4o-mini.
+
+    Slow calls are hedged with a duplicate request; while the circuit breaker
+    is open or the output can't be parsed, falls back to local keyword scoring.
+    """
     #transcript_sample = transcript_sample if transcript_sample else "Not available"
     description = (
         description[:3500] if description else ""
@@ -59,8 +178,14 @@ def analyze_content(
     print(content)
     print("================================\n")
 
-    try:
-        response = client.chat.completions.create(
+    if not circuit_breaker.allow_request():
+        print(f"Circuit breaker open, using local scoring for title '{title}'")
+        return local_analysis(search_term, title, description)
+
+    request_client = get_openai_client().with_options(timeout=OPENAI_CALL_TIMEOUT, max_retries=0)
+
+    def create_completion():
+        return request_client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
                 {
@@ -70,28 +195,49 @@ def analyze_content(
                 {"role": "user", "content": content},
             ],
             temperature=0.3,
-            max_tokens=150,
+            max_tokens=ANALYSIS_MAX_TOKENS,
+            response_format=ANALYSIS_RESPONSE_FORMAT,
         )
 
+    try:
+        try:
+            response = await hedged_call(create_completion, latency_tracker, OPENAI_CALL_TIMEOUT)
+            circuit_breaker.record_success()
+        except provider_errors() as e:
+            circuit_breaker.record_failure()
+            print(f"OpenAI provider error for title '{title}', using local scoring: {e!r}")
+            return local_analysis(search_term, title, description)
+        except Exception:
+            # The provider answered (e.g. a 400), so it isn't degraded
+            circuit_breaker.record_success()
+            raise
+        finally:
+            # Cancellation skips the handlers above; don't leave the half-open trial slot taken
+            circuit_breaker.release_trial()
+
         print("\n=== GPT API Response ===")
         print("Raw response:", response)
 
-        raw_content = response.choices[0].message.content.strip()
+        message = response.choices[0].message
+        if getattr(message, "refusal", None):
+            raise ValueError(f"Model refused: {message.refusal}")
+
+        raw_content = message.content or ""
         print("\nExtracted content:", raw_content)
 
-        if raw_content.startswith("```json") and raw_content.endswith("```"):
-            raw_content = raw_content[7:-3].strip()
+        analysis, repaired = parse_analysis(raw_content)
 
-        print("\nProcessed content:", raw_content)
+        print("\nProcessed content:", analysis)
         print("=======================\n")
 
-        return json.loads(raw_content)
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error for title '{title}': {str(e)}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error in content analysis for title '{title}': JSON decode error",
-        )
+        if repaired:
+            # Flagged like fallbacks so a partial result isn't cached for a day
+            return {**analysis.model_dump(), "repaired": True}
+        return analysis.model_dump()
+    except ValueError as e:
+        # Only this video degrades; the fallback flag keeps the result out of the cache
+        print(f"Invalid analysis output for title '{title}', using local scoring: {str(e)}")
+        return local_analysis(search_term, title, description)
     except HTTPException as http_ex:
         print(f"HTTPException: {str(http_ex)}")
         raise
@@ -0,0 +1,140 @@
+"""Page and static asset delivery.
+
+Static files and the pages rendered from static/templates are loaded once,
+then served from memory with content-hash ETags and gzip/brotli variants
+compressed ahead of time.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+from functools import lru_cache
+import brotli
+from fastapi import HTTPException, Request, Response
+from fastapi.templating import Jinja2Templates
+from responses import choose_encoding, COMPRESSION_MIN_SIZE
+
+STATIC_DIRECTORY = "static"
+TEMPLATE_DIRECTORY = "static/templates"
+
+# Templates without per-request content, rendered once
+PAGE_TEMPLATES = ["index.html", "checkout_success.html", "login.html", "dashboard.html"]
+
+# Fingerprinted URLs never change content, so browsers can keep them for a year
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Everything else is revalidated with its ETag
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+class Asset:
+    """Response body with precompressed variants, each with its own ETag"""
+
+    def __init__(self, body: bytes, media_type: str):
+        digest = hashlib.sha256(body).hexdigest()
+        self.body = body
+        self.media_type = media_type
+        self.version = digest[:12]
+        self.variants = {}
+        # Each encoding is a different representation, so it needs its own strong ETag
+        self.etags = {None: f'"{digest[:16]}"'}
+        if media_type.startswith(COMPRESSIBLE_TYPES) and len(body) >= COMPRESSION_MIN_SIZE:
+            # Compressed once at startup, so use the maximum levels
+            for encoding, compressed in (("br", brotli.compress(body, quality=11)),
+                                         ("gzip", gzip.compress(body, compresslevel=9))):
+                if len(compressed) < len(body):
+                    self.variants[encoding] = compressed
+                    self.etags[encoding] = f'"{digest[:16]}-{encoding}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match lists etag (weak comparison, as for GET)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag in tags
+
+
+def asset_response(request: Request, asset: Asset, cache_control: str = REVALIDATE_CACHE_CONTROL) -> Response:
+    """Serve asset, picking a precompressed variant and answering 304 if its ETag matches"""
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    if encoding not in asset.variants:
+        encoding = None
+    etag = asset.etags[encoding]
+    headers = {"etag": etag, "cache-control": cache_control, "vary": "Accept-Encoding"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["content-encoding"] = encoding
+    return Response(content=asset.variants.get(encoding, asset.body), media_type=asset.media_type, headers=headers)
+
+
+class StaticAssets:
+    """Every file under a directory, loaded into memory and fingerprinted"""
+
+    def __init__(self, directory: str, url_prefix: str = "/static"):
+        self.url_prefix = url_prefix
+        self.assets = {}
+        for root, _, files in os.walk(directory):
+            for name in files:
+                full_path = os.path.join(root, name)
+                path = os.path.relpath(full_path, directory).replace(os.sep, "/")
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                if media_type.startswith("text/"):
+                    media_type += "; charset=utf-8"
+                with open(full_path, "rb") as f:
+                    self.assets[path] = Asset(f.read(), media_type)
+
+    def url(self, path: str) -> str:
+        """Fingerprinted URL for path, cacheable forever"""
+        asset = self.assets.get(path)
+        if asset is None:
+            return f"{self.url_prefix}/{path}"
+        return f"{self.url_prefix}/{path}?v={asset.version}"
+
+    def response(self, request: Request, path: str) -> Response:
+        asset = self.assets.get(path)
+        if asset is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+        # Only the current version is immutable; stale or missing ?v= revalidates
+        immutable = request.query_params.get("v") == asset.version
+        return asset_response(request, asset, IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL)
+
+
+class Pages:
+    """Templates rendered once, with static_url() available for asset links"""
+
+    def __init__(self, directory: str, names: list, static_assets: StaticAssets):
+        templates = Jinja2Templates(directory=directory)
+        templates.env.auto_reload = False
+        templates.env.globals["static_url"] = static_assets.url
+        self.pages = {
+            name: Asset(templates.get_template(name).render().encode(), "text/html; charset=utf-8")
+            for name in names
+        }
+
+    def response(self, request: Request, name: str, cache_control: str = REVALIDATE_CACHE_CONTROL) -> Response:
+        return asset_response(request, self.pages[name], cache_control)
+
+
+@lru_cache(maxsize=None)
+def get_static_assets() -> StaticAssets:
+    return StaticAssets(STATIC_DIRECTORY)
+
+
+@lru_cache(maxsize=None)
+def get_pages() -> Pages:
+    return Pages(TEMPLATE_DIRECTORY, PAGE_TEMPLATES, get_static_assets())
+
+
+async def serve_static(request: Request, path: str):
+    """Serve a file from the static directory"""
+    return get_static_assets().response(request, path)
+
+
+def page_response(request: Request, name: str, cache_control: str = REVALIDATE_CACHE_CONTROL) -> Response:
+    """Serve a pre-rendered page"""
+    return get_pages().response(request, name, cache_control)
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Rolling window of call latencies used to pick the hedge deadline"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20, percentile: float = 0.95,
+                 default_deadline: float = 3.0, min_deadline: float = 0.5, max_deadline: float = 10.0):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self.default_deadline = default_deadline
+        self.min_deadline = min_deadline
+        self.max_deadline = max_deadline
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, latency: float):
+        self.samples.append(latency)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def hedge_deadline(self) -> float:
+        """Seconds to wait on the primary call before sending a duplicate"""
+        if len(self.samples) < self.min_samples:
+            return self.default_deadline
+        return min(max(self.quantile(self.percentile), self.min_deadline), self.max_deadline)
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": self.hedges / self.calls if self.calls else 0.0,
+            "hedge_deadline": self.hedge_deadline(),
+            "latency_p50": self.quantile(0.5),
+            "latency_p95": self.quantile(0.95),
+            "latency_p99": self.quantile(0.99),
+        }
+
+
+class CircuitBreaker:
+    """Fails fast after repeated provider errors, then lets a single trial call through"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.trial_in_flight = False
+
+    def allow_request(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self.trial_in_flight:
+                self.rejected += 1
+                return False
+            self.trial_in_flight = True
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                print(f"Circuit breaker opened after {self.failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Free the half-open trial slot without recording an outcome, e.g. after cancellation"""
+        self.trial_in_flight = False
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+
+async def hedged_call(call: Callable[[], Awaitable[T]], tracker: LatencyTracker, timeout: float) -> T:
+    """Run call(), sending one duplicate if it outlives the tracker's hedge deadline.
+
+    The first successful result wins and the other attempt is cancelled. If both
+    attempts fail, the last error is raised; asyncio.TimeoutError if neither
+    finishes within timeout.
+    """
+    tracker.calls += 1
+    start = time.monotonic()
+    primary = asyncio.create_task(call())
+    pending = {primary}
+    hedge = None
+    error = None
+
+    try:
+        done, pending = await asyncio.wait(pending, timeout=tracker.hedge_deadline())
+        if not done:
+            tracker.hedges += 1
+            hedge = asyncio.create_task(call())
+            pending.add(hedge)
+
+        while True:
+            for task in done:
+                if task.exception() is None:
+                    tracker.record(time.monotonic() - start)
+                    if task is hedge:
+                        tracker.hedge_wins += 1
+                    return task.result()
+                error = task.exception()
+            if not pending:
+                raise error
+
+            remaining = timeout - (time.monotonic() - start)
+            if remaining > 0:
+                done, pending = await asyncio.wait(pending, timeout=remaining,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+            if remaining <= 0 or not done:
+                # Count the timeout as a slow sample so the deadline adapts
+                tracker.record(timeout)
+                raise asyncio.TimeoutError()
+    finally:
+        for task in pending:
+            task.cancel()
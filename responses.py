@@ -0,0 +1,49 @@
+import gzip
+import brotli
+import orjson
+from fastapi import Request, Response
+
+# Bodies smaller than this aren't worth compressing
+COMPRESSION_MIN_SIZE = 1000
+
+# Moderate levels: most of the size win for a fraction of the CPU of the maximums
+BROTLI_QUALITY = 5
+GZIP_LEVEL = 6
+
+def choose_encoding(accept_encoding: str):
+    """Pick br or gzip from an Accept-Encoding header by q-value, preferring br on ties"""
+    qualities = {}
+    for part in accept_encoding.lower().split(","):
+        coding, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip()] = quality
+    # Codings not listed explicitly take the wildcard's q-value, if any
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for coding in ("br", "gzip"):
+        quality = qualities.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+def json_response(request: Request, content, status_code: int = 200) -> Response:
+    """Serialize content with orjson and compress it if the client accepts br or gzip"""
+    body = orjson.dumps(content)
+    headers = {"vary": "Accept-Encoding"}
+
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    if encoding and len(body) >= COMPRESSION_MIN_SIZE:
+        if encoding == "br":
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+        else:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        headers["content-encoding"] = encoding
+
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,95 @@
+"""Startup profiling for the API.
+
+Reports the slowest imports of `main` (via `python -X importtime`) and measures
+time-to-first-request of a fresh uvicorn worker, including the lifespan warm-up.
+
+    python startup_profile.py                  # print report
+    python startup_profile.py --output bench.jsonl  # also append a JSON record to track over time
+"""
+import argparse
+import json
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+# Cheap endpoint that doesn't touch any external service
+PROBE_PATH = "/metrics/cache"
+
+
+def import_profile(module: str = "main"):
+    """Return (total_seconds, [(cumulative_seconds, self_seconds, name), ...]) for importing module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us) / 1e6, int(self_us) / 1e6, name.rstrip()))
+
+    total = next((cumulative for cumulative, _, name in rows if name.strip() == module), 0.0)
+    return total, sorted(rows, reverse=True)
+
+
+def time_to_first_request(timeout: float = 60.0) -> float:
+    """Start a uvicorn worker and return seconds until it answers its first request"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{PROBE_PATH}", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.05)
+        raise TimeoutError(f"No response within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=20, help="number of slowest imports to show")
+    parser.add_argument("--output", help="append a JSON benchmark record to this file")
+    args = parser.parse_args()
+
+    import_seconds, rows = import_profile()
+    print(f"import main: {import_seconds:.3f}s")
+    print(f"{'cumulative':>11} {'self':>8}  module")
+    for cumulative, self_seconds, name in rows[:args.top]:
+        print(f"{cumulative:>10.3f}s {self_seconds:>7.3f}s  {name}")
+
+    ttfr = time_to_first_request()
+    print(f"\ntime to first request: {ttfr:.3f}s")
+
+    if args.output:
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "import_seconds": round(import_seconds, 4),
+            "time_to_first_request_seconds": round(ttfr, 4),
+        }
+        with open(args.output, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
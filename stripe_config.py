@@ -1,11 +1,19 @@
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
-import stripe
 
 load_dotenv()
 
-# Initialize Stripe with the secret key from .env
-stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+@lru_cache(maxsize=None)
+def get_stripe():
+    """Import and configure the Stripe SDK on first use; it is slow to import."""
+    import stripe
+    # Initialize Stripe with the secret key from .env
+    stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+    # Optional local stand-in such as stripe-mock (http://localhost:12111)
+    if os.getenv('STRIPE_API_BASE'):
+        stripe.api_base = os.getenv('STRIPE_API_BASE')
+    return stripe
 
 # Price IDs from .env
 PRICE_IDS = {
@@ -22,6 +30,8 @@ def create_checkout_session(plan: str, user_id: str, customer_email: str):
 
     print(f"Creating checkout session for plan: {plan} with price_id: {price_id}")
 
+    stripe = get_stripe()
+
     # Create or get customer
     customers = stripe.Customer.list(email=customer_email, limit=1)
     if customers.data:
@@ -0,0 +1,263 @@
+"""Reconcile the subscriptions table with Stripe.
+
+Webhooks keep subscriptions up to date one event at a time; this job repairs
+rows left stale by missed deliveries. Stripe state is diffed against the table
+in memory and only changed rows are written, in bulk.
+
+    python stripe_reconcile.py            # subscriptions changed since the last run
+    python stripe_reconcile.py --full     # every subscription in Stripe
+    python stripe_reconcile.py --dry-run  # report changes without writing
+
+Incremental runs page through customer.subscription.* events created since the
+stored watermark, so a nightly run costs O(changes). Point STRIPE_API_BASE at a
+local stripe-mock server to exercise it without touching Stripe.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+from auth import get_supabase
+from stripe_config import get_stripe
+
+STATE_PATH = os.getenv('STRIPE_RECONCILE_STATE', 'stripe_reconcile_state.json')
+
+SUBSCRIPTION_EVENT_TYPES = [
+    'customer.subscription.created',
+    'customer.subscription.updated',
+    'customer.subscription.deleted',
+]
+
+# Stripe only keeps events for 30 days; older watermarks need a full run
+EVENT_RETENTION = 30 * 24 * 3600
+
+# Re-read events this far before the watermark to cover clock skew and
+# events created while the previous run was in progress
+WATERMARK_OVERLAP = 300
+
+UPSERT_BATCH_SIZE = 500
+QUERY_BATCH_SIZE = 100
+PAGE_SIZE = 1000
+
+# Fields the job owns; everything else in a row is left alone
+SYNCED_FIELDS = [
+    'stripe_customer_id',
+    'stripe_subscription_id',
+    'plan_type',
+    'status',
+    'current_period_start',
+    'current_period_end',
+    'cancel_at_period_end',
+]
+TIMESTAMP_FIELDS = {'current_period_start', 'current_period_end'}
+
+# Statuses (after mapping) of subscriptions that can no longer become active
+ENDED_STATUSES = {'expired', 'incomplete_expired'}
+
+def load_watermark(path: str = STATE_PATH):
+    """Return the start time of the last successful run, or None"""
+    try:
+        with open(path) as f:
+            return json.load(f).get('watermark')
+    except FileNotFoundError:
+        return None
+
+def save_watermark(watermark: int, path: str = STATE_PATH):
+    with open(path, 'w') as f:
+        json.dump({'watermark': watermark}, f)
+
+def fetch_all_subscriptions(stripe) -> dict:
+    """Every subscription in Stripe, keyed by ID"""
+    subscriptions = stripe.Subscription.list(status='all', limit=100)
+    return {subscription.id: subscription for subscription in subscriptions.auto_paging_iter()}
+
+def fetch_changed_subscriptions(stripe, since: int) -> dict:
+    """Latest snapshot of each subscription with an event since `since`, keyed by ID"""
+    events = stripe.Event.list(types=SUBSCRIPTION_EVENT_TYPES, created={'gte': since}, limit=100)
+    changed = {}
+    # Events are listed newest first, so the first snapshot seen is the current one
+    for event in events.auto_paging_iter():
+        subscription = event.data.object
+        changed.setdefault(subscription.id, subscription)
+    return changed
+
+def plan_type_for(subscription):
+    """Map the subscription's price interval to a plan type, as the checkout webhook does"""
+    items = subscription['items'].data
+    recurring = items[0].price.recurring if items else None
+    interval = recurring.get('interval') if recurring else None
+    return {'month': 'monthly', 'year': 'yearly'}.get(interval)
+
+def subscription_row(subscription) -> dict:
+    """Subscription fields as the webhook handlers would write them"""
+    return {
+        'stripe_customer_id': subscription.customer,
+        'stripe_subscription_id': subscription.id,
+        'plan_type': plan_type_for(subscription),
+        # customer.subscription.deleted marks canceled subscriptions as expired
+        'status': 'expired' if subscription.status == 'canceled' else subscription.status,
+        # Timezone-aware UTC so the value doesn't depend on the host's TZ
+        'current_period_start': datetime.fromtimestamp(subscription.current_period_start, timezone.utc).isoformat(),
+        'current_period_end': datetime.fromtimestamp(subscription.current_period_end, timezone.utc).isoformat(),
+        'cancel_at_period_end': subscription.cancel_at_period_end,
+    }
+
+def _utc_timestamp(value: str) -> float:
+    parsed = datetime.fromisoformat(value)
+    # Postgres reads naive timestamps as UTC, so do the same rather than using host-local time
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def _same_time(a, b) -> bool:
+    if a is None or b is None:
+        return a == b
+    # Supabase may return these with a timezone and different precision
+    return abs(_utc_timestamp(a) - _utc_timestamp(b)) < 1
+
+def diff_row(existing: dict, desired: dict) -> dict:
+    """Fields of desired that differ from the existing row"""
+    changes = {}
+    for field in SYNCED_FIELDS:
+        if field in TIMESTAMP_FIELDS:
+            if not _same_time(existing.get(field), desired[field]):
+                changes[field] = desired[field]
+        elif existing.get(field) != desired[field]:
+            changes[field] = desired[field]
+    return changes
+
+def load_rows(supabase, customer_ids=None) -> list:
+    """Subscription rows, optionally limited to the given Stripe customers"""
+    table = supabase.table('subscriptions')
+    if customer_ids is not None:
+        customer_ids = list(customer_ids)
+        rows = []
+        for i in range(0, len(customer_ids), QUERY_BATCH_SIZE):
+            batch = customer_ids[i:i + QUERY_BATCH_SIZE]
+            rows.extend(table.select('*').in_('stripe_customer_id', batch).execute().data)
+        return rows
+
+    # Order by the primary key so pages don't overlap, and stop on an empty page
+    # rather than a short one, since the project's max_rows may be below PAGE_SIZE
+    rows = []
+    while True:
+        page = table.select('*').order('id').range(len(rows), len(rows) + PAGE_SIZE - 1).execute().data
+        if not page:
+            return rows
+        rows.extend(page)
+
+def find_user_id(stripe, subscription):
+    """User ID from the checkout session that created the subscription"""
+    sessions = stripe.checkout.Session.list(subscription=subscription.id, limit=1)
+    return sessions.data[0].client_reference_id if sessions.data else None
+
+def user_has_row(supabase, user_id: str) -> bool:
+    """Whether the user already has a subscriptions row, under any customer"""
+    return bool(supabase.table('subscriptions').select('user_id').eq('user_id', user_id).limit(1).execute().data)
+
+def upsert_payload(row: dict) -> dict:
+    """The columns an update writes back, so columns the job doesn't own are never overwritten"""
+    # user_id never changes, but the upsert's INSERT half rejects a NULL before the conflict resolves
+    return {
+        'id': row['id'],
+        'user_id': row['user_id'],
+        **{field: row.get(field) for field in SYNCED_FIELDS},
+        'updated_at': row['updated_at'],
+    }
+
+def write_batches(supabase, upserts: list, inserts: list):
+    table = supabase.table('subscriptions')
+    for i in range(0, len(upserts), UPSERT_BATCH_SIZE):
+        table.upsert(upserts[i:i + UPSERT_BATCH_SIZE]).execute()
+    for i in range(0, len(inserts), UPSERT_BATCH_SIZE):
+        table.insert(inserts[i:i + UPSERT_BATCH_SIZE]).execute()
+
+def reconcile(stripe, supabase, since=None, dry_run: bool = False) -> dict:
+    """Bring subscriptions rows in line with Stripe and return counts of what changed.
+
+    since=None reconciles every subscription; otherwise only those with events
+    created at or after `since`.
+    """
+    if since is None:
+        subscriptions = fetch_all_subscriptions(stripe)
+        rows = load_rows(supabase)
+    else:
+        subscriptions = fetch_changed_subscriptions(stripe, since)
+        rows = load_rows(supabase, {subscription.customer for subscription in subscriptions.values()})
+
+    by_subscription = {row['stripe_subscription_id']: row for row in rows if row.get('stripe_subscription_id')}
+    # Lifetime purchases have no Stripe subscription and must not be overwritten
+    by_customer = {row['stripe_customer_id']: row for row in rows
+                   if row.get('stripe_customer_id') and row.get('plan_type') != 'lifetime'}
+    users_with_rows = {row.get('user_id') for row in rows}
+
+    stats = {'checked': len(subscriptions), 'unchanged': 0, 'updated': 0, 'inserted': 0, 'unmatched': 0}
+    updates = {}  # id(row) -> row with changes applied, trimmed to upsert_payload() on write
+    inserts = {}  # customer ID -> new row
+    now = datetime.now(timezone.utc).isoformat()
+
+    candidates = [(subscription, subscription_row(subscription)) for subscription in subscriptions.values()]
+    # Ended subscriptions first, so a customer's live subscription wins when both changed
+    candidates.sort(key=lambda candidate: candidate[1]['status'] not in ENDED_STATUSES)
+
+    for subscription, desired in candidates:
+        existing = by_subscription.get(subscription.id) or by_customer.get(subscription.customer)
+
+        if existing is None:
+            # Nothing to restore for a subscription that has already ended
+            if desired['status'] in ENDED_STATUSES:
+                stats['unchanged'] += 1
+                continue
+            user_id = find_user_id(stripe, subscription)
+            # The user's row may be under another customer ID that this run didn't load
+            if not user_id or user_id in users_with_rows or user_has_row(supabase, user_id):
+                print(f"No user to attach subscription {subscription.id} to")
+                stats['unmatched'] += 1
+                continue
+            users_with_rows.add(user_id)
+            inserts[subscription.customer] = {**desired, 'user_id': user_id, 'updated_at': now}
+            continue
+
+        current = updates.get(id(existing), existing)
+        # A customer's row follows their live subscription; ended ones don't take it over
+        if current.get('stripe_subscription_id') not in (None, subscription.id) \
+                and desired['status'] in ENDED_STATUSES:
+            stats['unchanged'] += 1
+            continue
+
+        changes = diff_row(current, desired)
+        if not changes:
+            stats['unchanged'] += 1
+            continue
+        print(f"Subscription {subscription.id} for user {existing.get('user_id')}: {changes}")
+        updates[id(existing)] = {**current, **changes, 'updated_at': now}
+
+    stats['updated'] = len(updates)
+    stats['inserted'] = len(inserts)
+    if not dry_run:
+        write_batches(supabase, [upsert_payload(row) for row in updates.values()], list(inserts.values()))
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--full', action='store_true', help='reconcile every subscription, ignoring the watermark')
+    parser.add_argument('--dry-run', action='store_true', help='report changes without writing them')
+    parser.add_argument('--state', default=STATE_PATH, help='file holding the watermark')
+    args = parser.parse_args()
+
+    run_started = int(time.time())
+    watermark = None if args.full else load_watermark(args.state)
+    if watermark is not None and run_started - watermark > EVENT_RETENTION:
+        print("Watermark is older than Stripe's event retention, running a full reconciliation")
+        watermark = None
+    since = watermark - WATERMARK_OVERLAP if watermark is not None else None
+
+    print(f"Reconciling subscriptions {'since ' + datetime.fromtimestamp(since).isoformat() if since is not None else '(full)'}")
+    stats = reconcile(get_stripe(), get_supabase(), since=since, dry_run=args.dry_run)
+    print(f"Reconciliation {'(dry run) ' if args.dry_run else ''}finished: {stats}")
+
+    if not args.dry_run:
+        save_watermark(run_started, args.state)
+
+if __name__ == '__main__':
+    main()
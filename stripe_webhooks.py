@@ -1,8 +1,8 @@
-import stripe
 from datetime import datetime
 import os
 from typing import Optional
-from auth import supabase
+from auth import get_supabase
+from stripe_config import get_stripe
 import httpx
 
 async def call_verify_user(user_id: str):
@@ -26,7 +26,7 @@ async def handle_subscription_updated(event):
         print(f"Processing subscription update for customer {customer_id}")
         
         # Get user by stripe customer ID
-        user_data = supabase.table('subscriptions').select('user_id').eq('stripe_customer_id', customer_id).execute()
+        user_data = get_supabase().table('subscriptions').select('user_id').eq('stripe_customer_id', customer_id).execute()
         if not user_data.data:
             print(f"No subscription found for customer {customer_id}")
             return
@@ -43,7 +43,7 @@ async def handle_subscription_updated(event):
         }
         
         print(f"Updating subscription data for user {user_id}")
-        supabase.table('subscriptions').update(subscription_data).eq('stripe_customer_id', customer_id).execute()
+        get_supabase().table('subscriptions').update(subscription_data).eq('stripe_customer_id', customer_id).execute()
         print("Subscription update successful")
         
         # Update subscription token
@@ -70,6 +70,7 @@ async def handle_checkout_completed(event):
         print(f"Customer ID: {customer_id}, Subscription ID: {subscription_id}")
         
         # Get line items using Stripe API
+        stripe = get_stripe()
         session_with_items = stripe.checkout.Session.retrieve(
             session.id,
             expand=['line_items.data.price']
@@ -124,14 +125,14 @@ async def handle_checkout_completed(event):
         print(f"Preparing to save subscription data: {subscription_data}")
         
         # Check if subscription exists
-        existing = supabase.table('subscriptions').select('*').eq('user_id', user_id).execute()
+        existing = get_supabase().table('subscriptions').select('*').eq('user_id', user_id).execute()
         
         if existing.data:
             print(f"Updating existing subscription for user {user_id}")
-            supabase.table('subscriptions').update(subscription_data).eq('user_id', user_id).execute()
+            get_supabase().table('subscriptions').update(subscription_data).eq('user_id', user_id).execute()
         else:
             print(f"Creating new subscription for user {user_id}")
-            supabase.table('subscriptions').insert(subscription_data).execute()
+            get_supabase().table('subscriptions').insert(subscription_data).execute()
             
         print("Subscription saved successfully")
         
@@ -151,7 +152,7 @@ async def handle_subscription_deleted(event):
         print(f"Processing subscription deletion for customer {customer_id}")
         
         # Get user by stripe customer ID
-        user_data = supabase.table('subscriptions').select('user_id').eq('stripe_customer_id', customer_id).execute()
+        user_data = get_supabase().table('subscriptions').select('user_id').eq('stripe_customer_id', customer_id).execute()
         if not user_data.data:
             print(f"No subscription found for customer {customer_id}")
             return
@@ -165,7 +166,7 @@ async def handle_subscription_deleted(event):
         }
         
         print(f"Marking subscription as expired for customer {customer_id}")
-        supabase.table('subscriptions').update(subscription_data).eq('stripe_customer_id', customer_id).execute()
+        get_supabase().table('subscriptions').update(subscription_data).eq('stripe_customer_id', customer_id).execute()
         print("Subscription marked as expired")
         
         # Update subscription token
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Modules live at the repository root and validate their settings at import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('YOUTUBE_API_KEY', 'test')
+os.environ.setdefault('SUPABASE_URL', 'https://example.supabase.co')
+os.environ.setdefault('SUPABASE_KEY', 'test')
+os.environ.setdefault('CACHE_BACKEND', 'memory')
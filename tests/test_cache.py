@@ -0,0 +1,101 @@
+import sqlite3
+import time
+import pytest
+from cache import CacheBackend, MemoryCache, SQLiteCache
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryCache()
+    return SQLiteCache(str(tmp_path / 'cache.sqlite3'))
+
+
+def test_ttl_none_never_expires_and_zero_expires_immediately(backend):
+    backend.set('forever', {'a': 1})
+    backend.set('expired', 1, ttl=0)
+
+    assert backend.get('forever') == {'a': 1}
+    assert backend.get('expired') is None
+
+
+def test_incr_counts_within_window(backend):
+    assert backend.incr('counter', ttl=60) == 1
+    assert backend.incr('counter', ttl=60) == 2
+    assert backend.incr('gone', ttl=0) == 1
+    assert backend.incr('gone', ttl=0) == 1
+
+
+def test_incomplete_backend_fails_on_creation():
+    class GetOnly(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
+
+
+def test_sqlite_opens_lazily(tmp_path):
+    path = tmp_path / 'cache.sqlite3'
+    SQLiteCache(str(path))
+    assert not path.exists()
+
+
+def test_sqlite_errors_degrade_to_misses(tmp_path, monkeypatch):
+    backend = SQLiteCache(str(tmp_path / 'cache.sqlite3'))
+
+    def locked():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(backend, '_conn', locked)
+
+    assert backend.get('key') is None
+    backend.set('key', 1)
+    backend.delete('key')
+    assert backend.incr('counter') == 1
+    assert backend.stats()['misses'] == 1
+
+
+def test_unwritable_path_degrades_to_misses(tmp_path):
+    backend = SQLiteCache(str(tmp_path / 'missing' / 'cache.sqlite3'))
+
+    backend.set('key', 1)
+    assert backend.get('key') is None
+
+
+def test_memory_cache_evicts_least_recently_used():
+    backend = MemoryCache(max_entries=2)
+    backend.set('a', 1)
+    backend.set('b', 2)
+    backend.get('a')
+    backend.set('c', 3)
+
+    assert backend.get('a') == 1
+    assert backend.get('b') is None
+    assert backend.get('c') == 3
+
+
+def test_memory_cache_purges_expired_entries(monkeypatch):
+    monkeypatch.setattr(MemoryCache, 'PURGE_INTERVAL', 3)
+    backend = MemoryCache()
+    backend.set('old', 1, ttl=0)
+    backend.set('other', 2, ttl=0)
+    backend.set('kept', 3)
+
+    assert list(backend._data) == ['kept']
+
+
+def test_sqlite_lock_fails_fast(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    backend = SQLiteCache(path)
+    backend.set('key', 1)
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        start = time.monotonic()
+        backend.set('key', 2)
+        assert backend.incr('counter') == 1
+        assert time.monotonic() - start < 1.0
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
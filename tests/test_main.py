@@ -0,0 +1,64 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+import main
+from cache import MemoryCache
+
+DESCRIPTION = 'd' * (main.COMPACT_DESCRIPTION_LENGTH + 50)
+
+
+def test_parse_fields_always_includes_video_id():
+    assert main.parse_fields(None) is None
+    assert main.parse_fields('') is None
+    assert main.parse_fields(' match_rate , ,title') == {'video_id', 'match_rate', 'title'}
+
+
+def test_parse_fields_rejects_unknown_fields():
+    with pytest.raises(HTTPException) as error:
+        main.parse_fields('match_rate,transcript')
+
+    assert error.value.status_code == 400
+    assert 'transcript' in error.value.detail
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def analyze_content(search_term, title, description, comments):
+        return {'match_rate': 80.0, 'comment_summaries': ['useful']}
+
+    monkeypatch.setattr(main, 'cache', MemoryCache())
+    monkeypatch.setattr(main, 'get_youtube_client', lambda: None)
+    monkeypatch.setattr(main, 'get_video_details', lambda youtube, video_id: {'title': f'Video {video_id}',
+                                                                              'description': DESCRIPTION})
+    monkeypatch.setattr(main, 'get_video_comments', lambda youtube, video_id: [])
+    monkeypatch.setattr(main, 'analyze_content', analyze_content)
+    app = main.create_app()
+    app.dependency_overrides[main.get_subscription_status] = lambda: {}
+    # Not used as a context manager, so the warm-up lifespan doesn't run
+    return TestClient(app)
+
+
+def analyze(client, **params):
+    return client.post('/analyze/', params=params, json={'video_ids': ['a', 'b'], 'search_term': 'python'})
+
+
+def test_analyze_returns_full_results(client):
+    response = analyze(client)
+
+    assert response.status_code == 200
+    assert [item['video_id'] for item in response.json()] == ['a', 'b']
+    assert response.json()[0]['description'] == DESCRIPTION
+
+
+def test_compact_truncates_descriptions(client):
+    [first, _] = analyze(client, compact='true').json()
+
+    assert first['description'] == DESCRIPTION[:main.COMPACT_DESCRIPTION_LENGTH]
+    assert first['title'] == 'Video a'
+
+
+def test_fields_limit_results(client):
+    response = analyze(client, fields='match_rate', compact='true')
+
+    assert response.json() == [{'video_id': 'a', 'match_rate': 80.0}, {'video_id': 'b', 'match_rate': 80.0}]
+    assert analyze(client, fields='bogus').status_code == 400
@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from pydantic import ValidationError
+import openai_client
+from models import ContentAnalysis
+from openai_client import parse_analysis
+from resilience import CircuitBreaker
+
+
+def test_valid_output_is_not_repaired():
+    analysis, repaired = parse_analysis('{"match_rate": 72, "comment_summaries": ["clear", "too long"]}')
+
+    assert analysis.match_rate == 72
+    assert analysis.comment_summaries == ['clear', 'too long']
+    assert not repaired
+
+
+def test_fenced_output_is_parsed():
+    analysis, repaired = parse_analysis('```json\n{"match_rate": 40, "comment_summaries": ["ok"]}\n```')
+
+    assert analysis.match_rate == 40
+    assert not repaired
+
+
+def test_truncated_output_keeps_score_and_is_flagged():
+    analysis, repaired = parse_analysis('{"match_rate": 85, "comment_summaries": ["great expl')
+
+    assert analysis.match_rate == 85
+    assert analysis.comment_summaries == []
+    assert repaired
+
+
+@pytest.mark.parametrize('raw', [
+    '{"match_rate": null, "comment_summaries": []}',
+    '{"match_rate": "high", "comment_summaries": []}',
+    '{"comment_summaries": ["a"]}',
+    'not json at all',
+])
+def test_missing_or_garbage_match_rate_is_invalid(raw):
+    with pytest.raises(ValueError):
+        parse_analysis(raw)
+
+
+@pytest.mark.parametrize('value, expected', [(140, 100.0), (-5, 0.0), ('85%', 85.0), (' 12.5 ', 12.5)])
+def test_match_rate_is_coerced_and_clamped(value, expected):
+    assert ContentAnalysis(match_rate=value, comment_summaries=[]).match_rate == expected
+
+
+@pytest.mark.parametrize('value', [None, 'n/a', float('nan'), True])
+def test_match_rate_rejects_non_numbers(value):
+    with pytest.raises(ValidationError):
+        ContentAnalysis(match_rate=value, comment_summaries=[])
+
+
+def test_comment_summaries_are_cleaned_and_capped():
+    analysis = ContentAnalysis(match_rate=1, comment_summaries=[' a ', '', None, 'b', 'c', 'd'])
+
+    assert analysis.comment_summaries == ['a', 'b', 'c']
+    assert ContentAnalysis(match_rate=1, comment_summaries='single').comment_summaries == ['single']
+
+
+@pytest.mark.parametrize('value', [None, 3, {'a': 'b'}])
+def test_non_list_comment_summaries_are_invalid(value):
+    with pytest.raises(ValidationError):
+        ContentAnalysis(match_rate=1, comment_summaries=value)
+
+
+def test_invalid_output_degrades_to_local_scoring(monkeypatch):
+    monkeypatch.setattr(openai_client, 'circuit_breaker', CircuitBreaker())
+    monkeypatch.setattr(openai_client, 'count_tokens', lambda text: 0)
+
+    class GarbageClient:
+        def with_options(self, **kwargs):
+            return self
+
+        @property
+        def chat(self):
+            return self
+
+        @property
+        def completions(self):
+            return self
+
+        async def create(self, **kwargs):
+            message = type('Message', (), {'content': '{"match_rate": "unknown"}', 'refusal': None})()
+            return type('Response', (), {'choices': [type('Choice', (), {'message': message})()]})()
+
+    monkeypatch.setattr(openai_client, 'get_openai_client', GarbageClient)
+
+    analysis = asyncio.run(openai_client.analyze_content('python tutorial', 'Python tutorial', '', []))
+
+    assert analysis['fallback'] is True
+    assert analysis['match_rate'] == 100.0
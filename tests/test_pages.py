@@ -0,0 +1,73 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from pages import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, StaticAssets
+
+
+@pytest.fixture
+def assets(tmp_path):
+    (tmp_path / 'app.css').write_text('body { color: black; }\n' * 200)
+    (tmp_path / 'tiny.css').write_text('a{}')
+    return StaticAssets(str(tmp_path))
+
+
+@pytest.fixture
+def client(assets):
+    app = FastAPI()
+
+    @app.get('/static/{path:path}')
+    async def static(request: Request, path: str):
+        return assets.response(request, path)
+
+    return TestClient(app)
+
+
+def get(client, path, accept_encoding='identity', **headers):
+    return client.get(path, headers={'accept-encoding': accept_encoding, **headers})
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [('br, gzip', 'br'), ('gzip', 'gzip'), ('identity', None)])
+def test_variant_is_chosen_from_accept_encoding(client, accept_encoding, expected):
+    response = get(client, '/static/app.css', accept_encoding)
+
+    assert response.headers.get('content-encoding') == expected
+    assert response.headers['vary'] == 'Accept-Encoding'
+    assert response.text == 'body { color: black; }\n' * 200
+
+
+def test_small_files_are_not_compressed(client):
+    assert 'content-encoding' not in get(client, '/static/tiny.css', 'br, gzip').headers
+
+
+def test_each_encoding_has_its_own_etag(client):
+    etags = {get(client, '/static/app.css', encoding).headers['etag'] for encoding in ('br', 'gzip', 'identity')}
+
+    assert len(etags) == 3
+
+
+def test_matching_etag_returns_304(client):
+    etag = get(client, '/static/app.css', 'br').headers['etag']
+
+    response = get(client, '/static/app.css', 'br', **{'if-none-match': etag})
+    assert response.status_code == 304
+    assert response.headers['etag'] == etag
+    assert response.content == b''
+
+    # A br ETag doesn't validate the gzip representation
+    assert get(client, '/static/app.css', 'gzip', **{'if-none-match': etag}).status_code == 200
+
+
+def test_weak_etag_matches(client):
+    etag = get(client, '/static/app.css').headers['etag']
+
+    assert get(client, '/static/app.css', **{'if-none-match': f'W/{etag}'}).status_code == 304
+
+
+def test_current_version_is_immutable(client, assets):
+    assert get(client, assets.url('app.css')).headers['cache-control'] == IMMUTABLE_CACHE_CONTROL
+    assert get(client, '/static/app.css?v=stale').headers['cache-control'] == REVALIDATE_CACHE_CONTROL
+    assert get(client, '/static/app.css').headers['cache-control'] == REVALIDATE_CACHE_CONTROL
+
+
+def test_missing_asset_is_404(client):
+    assert get(client, '/static/missing.css').status_code == 404
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from resilience import CircuitBreaker, LatencyTracker, hedged_call
+
+
+def open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    return breaker
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = open_breaker()
+
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+
+
+def test_released_trial_lets_the_next_call_through():
+    breaker = open_breaker()
+    assert breaker.allow_request()
+
+    breaker.release_trial()
+
+    assert breaker.allow_request()
+
+
+def test_cancelled_trial_in_analyze_content_releases_the_slot(monkeypatch):
+    import openai_client
+
+    breaker = open_breaker()
+    monkeypatch.setattr(openai_client, 'circuit_breaker', breaker)
+    monkeypatch.setattr(openai_client, 'count_tokens', lambda text: 0)
+
+    class SlowClient:
+        def with_options(self, **kwargs):
+            return self
+
+        @property
+        def chat(self):
+            return self
+
+        @property
+        def completions(self):
+            return self
+
+        async def create(self, **kwargs):
+            await asyncio.sleep(10)
+
+    monkeypatch.setattr(openai_client, 'get_openai_client', SlowClient)
+
+    async def run():
+        task = asyncio.create_task(openai_client.analyze_content('term', 'title', 'description', []))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+
+    assert breaker.allow_request()
+
+
+def test_hedge_wins_when_primary_is_slow():
+    tracker = LatencyTracker(default_deadline=0.01)
+    calls = []
+
+    async def call():
+        calls.append(None)
+        await asyncio.sleep(1.0 if len(calls) == 1 else 0)
+        return len(calls)
+
+    assert asyncio.run(hedged_call(call, tracker, timeout=2.0)) == 2
+    assert tracker.hedges == 1
+    assert tracker.hedge_wins == 1
+
+
+def test_hedged_call_times_out():
+    async def call():
+        await asyncio.sleep(1.0)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(hedged_call(call, LatencyTracker(default_deadline=0.01), timeout=0.05))
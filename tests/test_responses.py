@@ -0,0 +1,56 @@
+import gzip
+import brotli
+import orjson
+import pytest
+from starlette.requests import Request
+from responses import COMPRESSION_MIN_SIZE, choose_encoding, json_response
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip, deflate, br', 'br'),
+    ('gzip', 'gzip'),
+    ('br;q=0.1, gzip;q=1', 'gzip'),
+    ('gzip;q=0.5, br;q=0.5', 'br'),
+    ('BR; Q=0.8, gzip;q=0.9', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('br;q=0, gzip;q=0', None),
+    ('gzip;q=bogus', None),
+    ('*', 'br'),
+    ('*;q=0.5, br;q=0', 'gzip'),
+    ('identity', None),
+    ('', None),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def make_request(accept_encoding):
+    return Request({'type': 'http', 'headers': [(b'accept-encoding', accept_encoding.encode())]})
+
+
+def test_small_bodies_are_not_compressed():
+    content = {'match_rate': 50}
+    response = json_response(make_request('br, gzip'), content)
+
+    assert 'content-encoding' not in response.headers
+    assert response.headers['vary'] == 'Accept-Encoding'
+    assert orjson.loads(response.body) == content
+
+
+@pytest.mark.parametrize('accept_encoding, decompress', [('br', brotli.decompress), ('gzip', gzip.decompress)])
+def test_large_bodies_are_compressed(accept_encoding, decompress):
+    content = [{'video_id': str(i), 'description': 'x' * 50} for i in range(50)]
+    assert len(orjson.dumps(content)) >= COMPRESSION_MIN_SIZE
+    response = json_response(make_request(accept_encoding), content, status_code=201)
+
+    assert response.status_code == 201
+    assert response.headers['content-encoding'] == accept_encoding
+    assert orjson.loads(decompress(response.body)) == content
+
+
+def test_large_bodies_without_accept_encoding_are_sent_plain():
+    content = ['x' * COMPRESSION_MIN_SIZE]
+    response = json_response(make_request('identity'), content)
+
+    assert 'content-encoding' not in response.headers
+    assert orjson.loads(response.body) == content
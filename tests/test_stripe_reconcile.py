@@ -0,0 +1,314 @@
+import time
+from datetime import datetime, timezone
+import pytest
+import stripe
+import stripe_reconcile
+from stripe_reconcile import reconcile
+
+PERIOD_START = 1700000000
+PERIOD_END = 1702592000
+
+
+def make_subscription(id, customer, status='active', interval='month', cancel_at_period_end=False):
+    return stripe.Subscription.construct_from({
+        'id': id,
+        'object': 'subscription',
+        'customer': customer,
+        'status': status,
+        'current_period_start': PERIOD_START,
+        'current_period_end': PERIOD_END,
+        'cancel_at_period_end': cancel_at_period_end,
+        'items': {'object': 'list', 'data': [
+            {'id': 'si_1', 'object': 'subscription_item',
+             'price': {'id': 'price_1', 'object': 'price', 'recurring': {'interval': interval}}},
+        ]},
+    }, 'sk_test')
+
+
+def make_row(id, user_id, customer, subscription_id, plan_type='monthly', status='active'):
+    return {
+        'id': id,
+        'user_id': user_id,
+        'stripe_customer_id': customer,
+        'stripe_subscription_id': subscription_id,
+        'plan_type': plan_type,
+        'status': status,
+        # As a timestamptz column returns them
+        'current_period_start': datetime.fromtimestamp(PERIOD_START, timezone.utc).isoformat(),
+        'current_period_end': datetime.fromtimestamp(PERIOD_END, timezone.utc).isoformat(),
+        'cancel_at_period_end': False,
+    }
+
+
+class FakeList:
+    def __init__(self, data):
+        self.data = data
+
+    def auto_paging_iter(self):
+        return iter(self.data)
+
+
+class FakeStripe:
+    """Stand-in for the stripe module with fixed subscriptions, events and checkout sessions"""
+
+    def __init__(self, subscriptions=(), events=(), session_users=None):
+        session_users = session_users or {}
+        test = self
+
+        class Subscription:
+            @staticmethod
+            def list(**kwargs):
+                return FakeList(list(subscriptions))
+
+        class Event:
+            @staticmethod
+            def list(**kwargs):
+                test.event_filters = kwargs
+                return FakeList([stripe.Event.construct_from(
+                    {'id': f'evt_{i}', 'object': 'event', 'data': {'object': subscription}}, 'sk_test')
+                    for i, subscription in enumerate(events)])
+
+        class Session:
+            @staticmethod
+            def list(subscription, limit):
+                user_id = session_users.get(subscription)
+                return FakeList([stripe.checkout.Session.construct_from(
+                    {'id': 'cs_1', 'object': 'checkout.session', 'client_reference_id': user_id}, 'sk_test')]
+                    if user_id else [])
+
+        class checkout:
+            pass
+
+        checkout.Session = Session
+        self.Subscription = Subscription
+        self.Event = Event
+        self.checkout = checkout
+
+
+class FakeQuery:
+    def __init__(self, table):
+        self.table = table
+        self.filters = []
+        self.order_by = None
+        self.bounds = None
+        self.limit_to = None
+
+    def select(self, *columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column):
+        self.order_by = column
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end)
+        return self
+
+    def limit(self, count):
+        self.limit_to = count
+        return self
+
+    def execute(self):
+        rows = [dict(row) for row in self.table.rows if all(f(row) for f in self.filters)]
+        if self.order_by:
+            rows.sort(key=lambda row: row[self.order_by])
+        if self.bounds:
+            # Mimic a PostgREST max_rows below the requested page size
+            start, end = self.bounds
+            rows = rows[start:min(end + 1, start + self.table.max_rows)]
+        if self.limit_to is not None:
+            rows = rows[:self.limit_to]
+        return type('Response', (), {'data': rows})()
+
+
+class FakeWrite:
+    def __init__(self, table, kind, rows):
+        self.table, self.kind, self.rows = table, kind, rows
+
+    def execute(self):
+        self.table.writes.append((self.kind, self.rows))
+        return type('Response', (), {'data': self.rows})()
+
+
+class FakeTable:
+    def __init__(self, rows, max_rows=1000):
+        self.rows = rows
+        self.max_rows = max_rows
+        self.writes = []
+
+    def select(self, *columns):
+        return FakeQuery(self).select(*columns)
+
+    def upsert(self, rows):
+        return FakeWrite(self, 'upsert', rows)
+
+    def insert(self, rows):
+        return FakeWrite(self, 'insert', rows)
+
+
+class FakeSupabase:
+    def __init__(self, rows=(), max_rows=1000):
+        self.subscriptions = FakeTable(list(rows), max_rows)
+
+    def table(self, name):
+        assert name == 'subscriptions'
+        return self.subscriptions
+
+    def written(self, kind):
+        return [row for write_kind, rows in self.subscriptions.writes if write_kind == kind for row in rows]
+
+
+def test_unchanged_subscription_is_not_written():
+    supabase = FakeSupabase([make_row(1, 'u1', 'cus_1', 'sub_1')])
+    stats = reconcile(FakeStripe([make_subscription('sub_1', 'cus_1')]), supabase)
+
+    assert stats['unchanged'] == 1
+    assert supabase.subscriptions.writes == []
+
+
+@pytest.fixture
+def non_utc_host(monkeypatch):
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_timestamps_match_regardless_of_host_timezone(non_utc_host):
+    supabase = FakeSupabase([make_row(1, 'u1', 'cus_1', 'sub_1')])
+    stats = reconcile(FakeStripe([make_subscription('sub_1', 'cus_1')]), supabase)
+
+    assert stats['unchanged'] == 1
+    assert supabase.subscriptions.writes == []
+
+
+def test_naive_timestamps_are_read_as_utc(non_utc_host):
+    row = make_row(1, 'u1', 'cus_1', 'sub_1')
+    row['current_period_start'] = datetime.fromtimestamp(PERIOD_START, timezone.utc).replace(tzinfo=None).isoformat()
+    supabase = FakeSupabase([row])
+    stats = reconcile(FakeStripe([make_subscription('sub_1', 'cus_1')]), supabase)
+
+    assert stats['unchanged'] == 1
+
+
+def test_changed_subscription_upserts_only_synced_fields():
+    existing = make_row(1, 'u1', 'cus_1', 'sub_1', status='past_due')
+    existing['created_at'] = '2023-01-01T00:00:00+00:00'
+    supabase = FakeSupabase([existing])
+    stats = reconcile(FakeStripe([make_subscription('sub_1', 'cus_1', cancel_at_period_end=True)]), supabase)
+
+    assert stats['updated'] == 1
+    [row] = supabase.written('upsert')
+    assert set(row) == {'id', 'user_id', 'updated_at', *stripe_reconcile.SYNCED_FIELDS}
+    assert row['id'] == 1
+    assert row['user_id'] == 'u1'
+    assert row['status'] == 'active'
+    assert row['cancel_at_period_end'] is True
+
+
+def test_lifetime_row_is_untouched():
+    supabase = FakeSupabase([make_row(1, 'u1', 'cus_1', None, plan_type='lifetime')])
+    stripe_api = FakeStripe([make_subscription('sub_old', 'cus_1', status='canceled')], session_users={'sub_old': 'u1'})
+    stats = reconcile(stripe_api, supabase)
+
+    assert stats['updated'] == 0
+    assert stats['inserted'] == 0
+    assert supabase.subscriptions.writes == []
+
+
+def test_live_subscription_wins_over_ended_one():
+    supabase = FakeSupabase([make_row(1, 'u1', 'cus_1', 'sub_old')])
+    stripe_api = FakeStripe([
+        make_subscription('sub_new', 'cus_1', interval='year'),
+        make_subscription('sub_old', 'cus_1', status='canceled'),
+    ])
+    reconcile(stripe_api, supabase)
+
+    [row] = supabase.written('upsert')
+    assert row['stripe_subscription_id'] == 'sub_new'
+    assert row['status'] == 'active'
+    assert row['plan_type'] == 'yearly'
+
+
+def test_ended_subscription_does_not_take_over_row():
+    supabase = FakeSupabase([make_row(1, 'u1', 'cus_1', 'sub_new')])
+    stripe_api = FakeStripe(events=[make_subscription('sub_old', 'cus_1', status='canceled')])
+    stats = reconcile(stripe_api, supabase, since=PERIOD_START)
+
+    assert stats['unchanged'] == 1
+    assert supabase.subscriptions.writes == []
+
+
+def test_missing_row_is_inserted_from_checkout_session():
+    supabase = FakeSupabase()
+    stripe_api = FakeStripe([make_subscription('sub_1', 'cus_1')], session_users={'sub_1': 'u1'})
+    stats = reconcile(stripe_api, supabase)
+
+    assert stats['inserted'] == 1
+    [row] = supabase.written('insert')
+    assert row['user_id'] == 'u1'
+    assert row['stripe_subscription_id'] == 'sub_1'
+
+
+def test_unmatched_subscriptions_are_not_inserted():
+    # u2 already has a row under a customer this incremental run doesn't load
+    supabase = FakeSupabase([make_row(1, 'u2', 'cus_other', 'sub_other')])
+    stripe_api = FakeStripe(
+        events=[
+            make_subscription('sub_1', 'cus_1'),
+            make_subscription('sub_2', 'cus_2'),
+            make_subscription('sub_3', 'cus_3', status='canceled'),
+        ],
+        session_users={'sub_2': 'u2', 'sub_3': 'u3'},
+    )
+    stats = reconcile(stripe_api, supabase, since=PERIOD_START)
+
+    assert stats['unmatched'] == 2
+    assert supabase.subscriptions.writes == []
+
+
+def test_two_subscriptions_for_one_user_insert_one_row():
+    supabase = FakeSupabase()
+    stripe_api = FakeStripe(
+        [make_subscription('sub_1', 'cus_1'), make_subscription('sub_2', 'cus_2')],
+        session_users={'sub_1': 'u1', 'sub_2': 'u1'},
+    )
+    stats = reconcile(stripe_api, supabase)
+
+    assert stats['inserted'] == 1
+    assert stats['unmatched'] == 1
+    assert len(supabase.written('insert')) == 1
+
+
+def test_full_run_pages_past_a_short_first_page():
+    rows = [make_row(i, f'u{i}', f'cus_{i}', f'sub_{i}') for i in range(5)]
+    supabase = FakeSupabase(reversed(rows), max_rows=2)
+    stripe_api = FakeStripe([make_subscription(f'sub_{i}', f'cus_{i}') for i in range(5)])
+    stats = reconcile(stripe_api, supabase)
+
+    assert stats['unchanged'] == 5
+    assert supabase.subscriptions.writes == []
+
+
+def test_dry_run_makes_no_writes(tmp_path, monkeypatch):
+    supabase = FakeSupabase([make_row(1, 'u1', 'cus_1', 'sub_1', status='past_due')])
+    stripe_api = FakeStripe([make_subscription('sub_1', 'cus_1'), make_subscription('sub_2', 'cus_2')],
+                            session_users={'sub_2': 'u2'})
+    state = tmp_path / 'state.json'
+    monkeypatch.setattr(stripe_reconcile, 'get_stripe', lambda: stripe_api)
+    monkeypatch.setattr(stripe_reconcile, 'get_supabase', lambda: supabase)
+    monkeypatch.setattr('sys.argv', ['stripe_reconcile.py', '--full', '--dry-run', '--state', str(state)])
+
+    stripe_reconcile.main()
+
+    assert supabase.subscriptions.writes == []
+    assert not state.exists()
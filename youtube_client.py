@@ -1,16 +1,25 @@
-import googleapiclient.discovery
+from functools import lru_cache
 from fastapi import HTTPException
 from config import YOUTUBE_API_KEY
+from cache import cache, YOUTUBE_TTL
 
+@lru_cache(maxsize=None)
 def get_youtube_client():
-    """Initialize and return a YouTube API client."""
+    """Build the YouTube API client once; the discovery import and build are slow."""
+    import googleapiclient.discovery
     return googleapiclient.discovery.build(
         "youtube", "v3", 
-        developerKey=YOUTUBE_API_KEY
+        developerKey=YOUTUBE_API_KEY,
+        cache_discovery=False
     )
 
 def get_video_details(youtube, video_id: str):
     """Fetch video metadata from YouTube API."""
+    cache_key = f"youtube:details:{video_id}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
         request = youtube.videos().list(part="snippet", id=video_id)
         response = request.execute()
@@ -18,12 +27,19 @@ def get_video_details(youtube, video_id: str):
         if not response['items']:
             raise HTTPException(status_code=404, detail=f"Video with ID {video_id} not found")
             
-        return response['items'][0]['snippet']
+        snippet = response['items'][0]['snippet']
+        cache.set(cache_key, snippet, ttl=YOUTUBE_TTL)
+        return snippet
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching video details for ID {video_id}: {str(e)}")
 
 def get_video_comments(youtube, video_id: str):
     """Fetch both top-rated (8) and recent (4) comments from YouTube API."""
+    cache_key = f"youtube:comments:{video_id}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
         request = youtube.commentThreads().list(
             part="snippet",
@@ -33,7 +49,9 @@ def get_video_comments(youtube, video_id: str):
         )
         response = request.execute()
         
-        return [item['snippet']['topLevelComment']['snippet']['textDisplay'] for item in response['items']]
+        comments = [item['snippet']['topLevelComment']['snippet']['textDisplay'] for item in response['items']]
+        cache.set(cache_key, comments, ttl=YOUTUBE_TTL)
+        return comments
     except Exception as e:
         print(f"Error fetching comments for video ID {video_id}: {str(e)}")
         return [] 
\ No newline at end of file